@@ -1,16 +1,67 @@
-import plotly.express as px
+import plotly.graph_objects as go
 from dash.dependencies import Input, Output, State
 from dash import dcc, html
 import dash_bootstrap_components as dbc
 import dash
 import pandas as pd
 import numpy as np
+import functools
+import json
+import os
 from entsoe.geo import utils
 
 # Load revenues and spreads data
-df_revenues_spreads = pd.read_csv('data/revenues_spreads.csv')
+df_revenues_spreads = pd.read_parquet(
+    'data/revenues_spreads.parquet',
+    columns=['Year', 'zoneName', 'battery_capacity', 'daily_cycle_limit',
+             'Revenue [€/MW/year]', 'Average daily spread [€]']
+)
+# zoneName is stored as categorical, downcast the small integer columns as well
+df_revenues_spreads = df_revenues_spreads.astype({'Year': 'int16', 'battery_capacity': 'int8', 'daily_cycle_limit': 'int8'})
+df_revenues_spreads['Revenue [€/MW/year]'] = df_revenues_spreads['Revenue [€/MW/year]'].round(2)
+
+# Zones in the order they are listed in the bubble chart, top to bottom
+ZONE_ORDER = sorted(df_revenues_spreads['zoneName'].unique())
+df_revenues_spreads['zoneName'] = pd.Categorical(df_revenues_spreads['zoneName'], categories=ZONE_ORDER, ordered=True)
+
+# Index on the callback inputs so slices are index lookups instead of boolean masks
+df_revenues_spreads_idx = df_revenues_spreads.set_index(
+    ['Year', 'battery_capacity', 'daily_cycle_limit']
+).sort_index()
+
+# Load zone geometries once, shared by all choropleth callbacks
+ZONES = df_revenues_spreads['zoneName'].unique()
+GEO_DF_BASE = utils.load_zones(ZONES, pd.Timestamp('20230101'))
+# Full resolution borders are not visible at the rendered map size, simplify to shrink the figure payload
+GEO_SIMPLIFY_TOLERANCE = float(os.environ.get('GEO_SIMPLIFY_TOLERANCE', 0.02))  # in degrees
+GEO_DF_BASE['geometry'] = GEO_DF_BASE.geometry.simplify(tolerance=GEO_SIMPLIFY_TOLERANCE, preserve_topology=True)
+# GeoJSON of the zones, feature ids are the zone names
+GEOJSON = json.loads(GEO_DF_BASE.geometry.to_json())
 
+# Layout shared by all choropleth figures, only the revenues differ per figure
+CHOROPLETH_LAYOUT = go.Layout(
+    geo=dict(projection_type="mercator", fitbounds="locations", visible=False),
+    coloraxis=dict(colorscale='inferno',
+                   cmin=0,
+                   cmax=160*10**3,
+                   colorbar=dict(title="Revenue [€/MW/year]", x=0.9)),
+    margin=dict(t=60),
+    height=650,
+    width=750
+)
+
+# Choropleth trace data for every selectable year, battery capacity and cycle limit, built in a single pass.
+# Only zones with data are listed. The browser swaps these into the displayed figure,
+# so the geometries are only sent once.
+CHOROPLETH_TRACES = {
+    f"{year}-{battery_capacity}-{daily_cycle_limit}": dict(locations=group['zoneName'].astype(str).values,
+                                                         z=group['Revenue [€/MW/year]'].values)
+    for (year, battery_capacity, daily_cycle_limit), group in df_revenues_spreads.dropna(
+        subset=['Revenue [€/MW/year]']).groupby(['Year', 'battery_capacity', 'daily_cycle_limit'])
+}
 
+
+# Only builds the initial figure of the layout, later figures are swapped in by the clientside callback
 def create_choropleth(year: str, battery_capacity: int, daily_cycle_limit: int):
     '''
     Creates a choropleth graph depicting the revenues per country for a given year.
@@ -21,35 +72,78 @@ def create_choropleth(year: str, battery_capacity: int, daily_cycle_limit: int):
             daily_cycle_limit: limit on number of load cycles the battery can make daily
 
         Returns:
-            fig: plotly express choropleth figure 
+            fig: plotly choropleth figure, as dict 
+    '''
+    fig = go.Figure(
+        go.Choropleth(geojson=GEOJSON,
+                      coloraxis="coloraxis",
+                      hovertemplate="zoneName=%{location}<br>Revenue [€/MW/year]=%{z}<extra></extra>",
+                      **CHOROPLETH_TRACES[f"{year}-{battery_capacity}-{daily_cycle_limit}"]),
+        layout=CHOROPLETH_LAYOUT
+    )
+    return fig.to_dict()
+
+
+# Input space is small (capacities x cycle limits), so every figure is cached as a dict.
+# Dash sends a dict figure without plotly's validation and copying. Cached dicts are shared and must not be mutated.
+@functools.lru_cache(maxsize=16)
+def create_bubble_chart(battery_capacity: int, daily_cycle_limit: int):
+    '''
+    Creates a bubble chart showing revenues and spreads for all zones, for the range of years.
+
+        Parameters: 
+            battery_capacity: capacity of battery in [h]
+            daily_cycle_limit: limit on number of load cycles the battery can make daily
+
+        Returns:
+            fig: plotly WebGL scatterplot figure, as dict 
     '''
-    zones = df_revenues_spreads['zoneName'].unique()
-    geo_df = utils.load_zones(zones, pd.Timestamp('20230101'))
-
-    df_revenues_spreads_slice = df_revenues_spreads[
-        (df_revenues_spreads['Year'] == year) &
-        (df_revenues_spreads['battery_capacity'] == battery_capacity) &
-        (df_revenues_spreads['daily_cycle_limit'] == daily_cycle_limit)
-    ]
-    df_revenues_spreads['Revenue [€/MW/year]'] = df_revenues_spreads['Revenue [€/MW/year]'].round(2)
-
-    geo_df = pd.merge(geo_df, df_revenues_spreads_slice, how="left", on="zoneName")
-    geo_df = geo_df.set_index('zoneName')
-
-    fig = px.choropleth(geo_df,
-                        geojson=geo_df.geometry,
-                        locations=geo_df.index,
-                        color=geo_df["Revenue [€/MW/year]"],
-                        projection="mercator",
-                        range_color=[0, 160*10**3],
-                        color_continuous_scale='inferno')
-    fig.update_geos(fitbounds="locations", visible=False)
-    fig.update_layout(height=650,
-                      width=750,
-                      coloraxis_colorbar_x=0.9
-                      )
-    return fig
+    df_revenues_spreads_slice = df_revenues_spreads_idx.xs(
+        (battery_capacity, daily_cycle_limit), level=('battery_capacity', 'daily_cycle_limit')
+    ).reset_index()
+    df = df_revenues_spreads_slice.rename(columns={"zoneName": "Zone"})
+    df = df[['Zone', 'Year', 'Revenue [€/MW/year]', 'Average daily spread [€]']]
+    hover_text = ('<b>' + df['Zone'].astype(str) + ' ' + df['Year'].astype(str) + '</b>'
+                  + '<br>Revenue: €' + df['Revenue [€/MW/year]'].map('{:.0f}'.format) + '/MW/year'
+                  + '<br>Average daily spread: €' + df['Average daily spread [€]'].map('{:.2f}'.format))
+
+    fig = go.Figure(
+        go.Scattergl(x=df['Year'],
+                     y=df['Zone'],
+                     mode='markers',
+                     marker=dict(color=df['Revenue [€/MW/year]'],
+                                 coloraxis='coloraxis',
+                                 size=df['Average daily spread [€]'],
+                                 sizemode='area'),
+                     customdata=hover_text.values,
+                     hovertemplate="%{customdata}<extra></extra>")
+    )
+    fig.update_layout(
+        coloraxis=dict(colorscale='inferno', cmin=0, cmax=160*10**3),
+        margin=dict(t=60),
+        paper_bgcolor="white",
+        plot_bgcolor="white",
+    )
+    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='LightGray')
+    fig.update_yaxes(categoryorder='array', categoryarray=ZONE_ORDER[::-1])
+    fig.update_layout(height=830, width=1060)
+    fig.update_coloraxes(colorbar=dict(title='Revenue [€/MW/year]'))
+    fig.update_traces(marker=dict(sizeref=0.18))
+    fig.update_yaxes(title="Bidding Zone")
+    fig.update_xaxes(title='Year', dtick=1)
+    fig.update_layout(showlegend=False)
+    return fig.to_dict()
+
 
+# Build the bubble chart for every battery capacity and cycle limit at load, so callbacks are served from the cache
+for battery_capacity, daily_cycle_limit in df_revenues_spreads_idx.index.droplevel('Year').unique():
+    create_bubble_chart(battery_capacity, daily_cycle_limit)
+
+
+# Selection shown when the page is loaded, used for both the controls and the initial figures
+DEFAULT_YEAR = 2016
+DEFAULT_BATTERY_CAPACITY = 1
+DEFAULT_CYCLE_LIMIT = 1
 
 app = dash.Dash(__name__, title="Value of day ahead EA with batteries in Europe",
                 external_stylesheets=[dbc.themes.MATERIA])
@@ -68,7 +162,8 @@ app.layout = dbc.Container(
                         children="Value of performing day ahead EA with batteries in Europe",
                     ),
                     html.Br(),
-                    dcc.Interval(id="animate", disabled=True, interval=4000)
+                    dcc.Interval(id="animate", disabled=True, interval=4000),
+                    dcc.Store(id="choropleth_traces", data=CHOROPLETH_TRACES)
                 ]),
                 dbc.Col([
                         html.Img(
@@ -93,7 +188,7 @@ app.layout = dbc.Container(
                         {"label": " 1  ", "value": 1},
                         {"label": " 2  ", "value": 2},
                     ],
-                    value=1,
+                    value=DEFAULT_BATTERY_CAPACITY,
                     id="battery_capacity",
                     className='radio_items',
                     inline=True
@@ -107,7 +202,7 @@ app.layout = dbc.Container(
                         {"label": " 2  ", "value": 2},
                         {"label": " 3  ", "value": 3}
                     ],
-                    value=1,
+                    value=DEFAULT_CYCLE_LIMIT,
                     id="daily_cycle_limit",
                     className='radio_items',
                     inline=True
@@ -130,12 +225,12 @@ app.layout = dbc.Container(
                                 dbc.CardBody([
                                     html.H3("Select a year to display:"),
                                     dcc.Slider(2016, 2023, 1,
-                                               value=2016,
+                                               value=DEFAULT_YEAR,
                                                marks={year: f"{year}" for year in range(2015, 2024)},
                                                id="year_slider"
                                                ),
                                     html.Button("Play/Pause", id="play"),
-                                    dcc.Graph(id="choropleth"),
+                                    dcc.Graph(id="choropleth", figure=create_choropleth(DEFAULT_YEAR, DEFAULT_BATTERY_CAPACITY, DEFAULT_CYCLE_LIMIT)),
                                     html.P("When a country is not visible on the map, there is no data available for that year."),
                                     html.P("Round-trip efficiency of the battery is taken to be 85%."),
                                     html.P("Revenues of 2023 are linearly scaled to one year.")                        
@@ -153,7 +248,7 @@ app.layout = dbc.Container(
                             [
                                 dbc.CardHeader(html.H1("Bubble chart showing battery day ahead EA revenues per country per year")),
                                 dbc.CardBody([
-                                    dcc.Graph(id="bubble_chart"),
+                                    dcc.Graph(id="bubble_chart", figure=create_bubble_chart(DEFAULT_BATTERY_CAPACITY, DEFAULT_CYCLE_LIMIT)),
                                     html.P("Size of the bubbles depict the average daily spread in €/MW.")
                                 ])
                             ],
@@ -169,45 +264,56 @@ app.layout = dbc.Container(
 )
 
 
-@app.callback(
-    Output("choropleth", "figure"),
+# Initial figures are part of the layout, so none of the callbacks has to run on page load.
+# Each callback only listens to the inputs its output depends on.
+
+# Advance the year on every animation tick in the browser, saving a server roundtrip per tick
+app.clientside_callback(
+    """
+    function(n, interval_disabled, year, min_year, max_year) {
+        if (interval_disabled) {
+            return window.dash_clientside.no_update;
+        }
+        return year >= max_year ? min_year : year + 1;
+    }
+    """,
     Output("year_slider", "value"),
     Input("animate", "n_intervals"),
     State("animate", "disabled"),
+    State("year_slider", "value"),
+    State("year_slider", "min"),
+    State("year_slider", "max"),
+    prevent_initial_call=True,
+)
+
+
+# Swap the revenues of the selected year, battery capacity and cycle limit into the displayed choropleth
+app.clientside_callback(
+    """
+    function(year, battery_capacity, daily_cycle_limit, traces, figure) {
+        const trace = traces[year + "-" + battery_capacity + "-" + daily_cycle_limit];
+        if (!trace) {
+            return window.dash_clientside.no_update;
+        }
+        return Object.assign({}, figure, {data: [Object.assign({}, figure.data[0], trace)]});
+    }
+    """,
+    Output("choropleth", "figure"),
     Input("year_slider", "value"),
     Input('battery_capacity', "value"),
     Input('daily_cycle_limit', "value"),
+    State("choropleth_traces", "data"),
+    State("choropleth", "figure"),
+    prevent_initial_call=True,
 )
-def update_choropleth_interval(n, interval_disabled: bool, year: str, battery_capacity: int, daily_cycle_limit: int):
-    '''
-    Updates choropleth graph when the year, battery_capacity or daily cycle limit is changed.
-    Year can be changed automatically using the dcc.Interval component.
-
-        Parameters: 
-            n: trigger of interval component.
-            interval_disabled: True if interval component is incactive. Can be activated by means of play/pause button.
-            year: year to depict.
-            battery_capacity: capacity of battery in [h].
-            daily_cycle_limit: limit on number of load cycles the battery can make daily.
-
-        Returns:
-            fig: plotly express choropleth figure.
-            year: year to display on dcc.Slider component.
-    '''
-    if not interval_disabled:
-        years = list(range(2016, 2024))  # TODO: change to select years in df_revenues_spreads
-        index = years.index(year)
-        index = (index + 1) % len(years)
-        year = years[index]
-    else:
-        year = year
-    return create_choropleth(year, battery_capacity, daily_cycle_limit), year
 
 
 @app.callback(
     Output("bubble_chart", "figure"),
     Input('battery_capacity', "value"),
-    Input('daily_cycle_limit', "value"))
+    Input('daily_cycle_limit', "value"),
+    prevent_initial_call=True,
+)
 def bubble_chart(battery_capacity: int, daily_cycle_limit: int):
     '''
     Creates and updates bubble chart showing revenues and spreads for all zones, for the range of years.
@@ -217,38 +323,16 @@ def bubble_chart(battery_capacity: int, daily_cycle_limit: int):
             daily_cycle_limit: limit on number of load cycles the battery can make daily.
 
         Returns:
-            fig: plotly express scatterplot figure.
+            fig: cached plotly WebGL scatterplot figure, as dict.
     '''
-    df_revenues_spreads_slice = df_revenues_spreads[
-        (df_revenues_spreads['battery_capacity'] == battery_capacity) &
-        (df_revenues_spreads['daily_cycle_limit'] == daily_cycle_limit)
-    ]
-    df = df_revenues_spreads_slice.sort_values("zoneName", ascending=False)
-    df = df.rename(columns={"zoneName": "Zone", "average_daily_spread": "Average daily spread [€]"})
-
-    fig = px.scatter(
-        df, y='Zone', x=df['Year'], color='Revenue [€/MW/year]', size='Average daily spread [€]', 
-        range_color=[0, 160*10**3],
-        color_continuous_scale='inferno',
-    )
-    fig.update_layout(
-        paper_bgcolor="white",
-        plot_bgcolor="white",
-    )
-    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='LightGray')
-    fig.update_layout(height=830, width=1060)
-    fig.update_coloraxes(colorbar=dict(title='Revenue [€/MW/year]'))
-    fig.update_traces(marker=dict(sizeref=0.18))
-    fig.update_yaxes(title="Bidding Zone")
-    fig.update_xaxes(title='Year', dtick=1)
-    fig.update_layout(showlegend=False)
-    return fig
+    return create_bubble_chart(battery_capacity, daily_cycle_limit)
 
 
 @app.callback(
     Output("animate", "disabled"),
     Input("play", "n_clicks"),
     State("animate", "disabled"),
+    prevent_initial_call=True,
 )
 def toggle(n, playing):
     '''
@@ -0,0 +1,10 @@
+'''
+Converts data/revenues_spreads.csv to data/revenues_spreads.parquet, which is the file loaded by app.py.
+Run from the repository root after updating the CSV: python scripts/csv_to_parquet.py
+'''
+import pandas as pd
+
+df_revenues_spreads = pd.read_csv('data/revenues_spreads.csv')
+# zoneName is stored as categorical, so app.py reads it without boxing every zone name as a string
+df_revenues_spreads['zoneName'] = df_revenues_spreads['zoneName'].astype('category')
+df_revenues_spreads.to_parquet('data/revenues_spreads.parquet', index=False)